@@ -0,0 +1,29 @@
+"""
+ASGI entry point: serves the Cython build of main.py when it is current,
+otherwise main.py itself.
+"""
+import importlib.util
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+MAIN_PY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+def load_app():
+    spec = importlib.util.find_spec("main_compiled")
+    if spec is not None and spec.origin:
+        if os.path.getmtime(spec.origin) < os.path.getmtime(MAIN_PY):
+            logger.warning("Compiled module %s is older than main.py; using main.py", spec.origin)
+        else:
+            try:
+                from main_compiled import app
+                return app
+            except ImportError as e:
+                logger.warning("Compiled module failed to import (%s); using main.py", e)
+    from main import app
+    return app
+
+
+app = load_app()
@@ -1,29 +1,129 @@
+import asyncio
+import logging
 import os
+import threading
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterable, AsyncIterator
 
-from fastapi import FastAPI, HTTPException, Depends, Header
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, EmailStr
+from fastapi import FastAPI, HTTPException, Depends, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
 import jwt
+import msgspec
+import orjson
 from passlib.context import CryptContext
 
-from database import db, create_document, get_documents
+from database import db, create_document, iter_documents
+from schemas import Email
+
+logger = logging.getLogger(__name__)
+
+# CORS
+# Comma-separated allowlist. Listed origins are echoed back with credentials;
+# when unset every origin gets "*" without credentials (auth is a bearer header)
+CORS_ORIGINS = frozenset(o.strip().encode() for o in os.getenv("CORS_ORIGINS", "").split(",") if o.strip())
+_CORS_ANY_ORIGIN = [(b"access-control-allow-origin", b"*")]
+_CORS_PREFLIGHT_HEADERS = [
+    (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+    (b"access-control-allow-headers", b"Authorization, Content-Type"),
+    (b"access-control-max-age", b"600"),
+    (b"content-length", b"0"),
+]
+
+
+class CORSAllowlistMiddleware:
+    """Minimal ASGI CORS: answers preflights directly and tags allowed responses"""
+
+    def __init__(self, app, origins: frozenset):
+        self.app = app
+        self.origins = origins
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        origin = None
+        preflight = False
+        for key, value in scope["headers"]:
+            if key == b"origin":
+                origin = value
+            elif key == b"access-control-request-method":
+                preflight = True
+        if origin is None:
+            return await self.app(scope, receive, send)
+        if not self.origins:
+            allow = _CORS_ANY_ORIGIN
+        elif origin in self.origins:
+            allow = [
+                (b"access-control-allow-origin", origin),
+                (b"access-control-allow-credentials", b"true"),
+                (b"vary", b"Origin"),
+            ]
+        else:
+            return await self.app(scope, receive, send)
+        if preflight and scope["method"] == "OPTIONS":
+            await send({"type": "http.response.start", "status": 200, "headers": allow + _CORS_PREFLIGHT_HEADERS})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *allow]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+
+# App
+app = FastAPI(title="Proton API", version="0.1.0", default_response_class=ORJSONResponse)
+app.add_middleware(CORSAllowlistMiddleware, origins=CORS_ORIGINS)
+
+
+# Indexes backing the per-user lookups and listings
+INDEXES = [
+    ("user", "email", {"unique": True}),
+    ("productlisting", "vendor_id", {}),
+    ("buyerrequirement", "buyer_id", {}),
+    ("transaction", [("investor_id", 1), ("project_id", 1)], {}),
+]
+
+
+@app.on_event("startup")
+async def ensure_indexes():
+    if db is None:
+        return
+    for col, keys, opts in INDEXES:
+        try:
+            await db[col].create_index(keys, **opts)
+        except Exception as e:
+            logger.warning("Index creation on %s failed: %s", col, e)
 
-# App and CORS
-app = FastAPI(title="Proton API", version="0.1.0")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
 # Security
 JWT_SECRET = os.getenv("JWT_SECRET", "dev_secret_change_me")
 JWT_ALG = "HS256"
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# argon2 for new hashes; bcrypt kept so existing hashes still verify (and get upgraded on login)
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    default="argon2",
+    deprecated="auto",
+    argon2__time_cost=2,
+    argon2__memory_cost=19456,
+    argon2__parallelism=1,
+)
+
+# Decoded JWT payloads keyed by raw token string: token -> (exp, payload)
+_TOKEN_CACHE: Dict[str, Tuple[float, dict]] = {}
+_TOKEN_CACHE_MAX = 4096
+# Sanitized user docs keyed by email: email -> (expires_at, user)
+_USER_CACHE: Dict[str, Tuple[float, dict]] = {}
+_USER_CACHE_MAX = 4096
+_USER_CACHE_TTL = 30.0
+_cache_lock = threading.Lock()
+
+_DEFAULT_TTL = timedelta(minutes=60)
 
 # Utilities
 
@@ -35,41 +135,88 @@ def verify_password(pw: str, hashed: str) -> bool:
     return pwd_context.verify(pw, hashed)
 
 
-def create_token(data: dict, expires_minutes: int = 60) -> str:
+def create_token(data: dict, now: Optional[datetime] = None, ttl: timedelta = _DEFAULT_TTL) -> str:
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(minutes=expires_minutes)
+    expire = (now or datetime.now(timezone.utc)) + ttl
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALG)
 
 
+def _cache_put(cache: dict, key: str, expires_at: float, value: dict, max_size: int) -> None:
+    with _cache_lock:
+        if len(cache) >= max_size:
+            # evict expired entries first, then the oldest if still full
+            now = time.time()
+            for k in [k for k, (e, _) in cache.items() if e <= now]:
+                del cache[k]
+            if len(cache) >= max_size:
+                del cache[next(iter(cache))]
+        cache[key] = (expires_at, value)
+
+
+def cache_user(user: dict) -> None:
+    _cache_put(_USER_CACHE, user["email"], time.time() + _USER_CACHE_TTL, user, _USER_CACHE_MAX)
+
+
 def decode_token(token: str) -> dict:
+    now = time.time()
+    cached = _TOKEN_CACHE.get(token)
+    if cached is not None:
+        exp, payload = cached
+        if exp > now:
+            return payload
+        with _cache_lock:
+            _TOKEN_CACHE.pop(token, None)
+        raise HTTPException(status_code=401, detail="Token expired")
     try:
-        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    exp = payload.get("exp")
+    if exp is not None:
+        _cache_put(_TOKEN_CACHE, token, float(exp), payload, _TOKEN_CACHE_MAX)
+    return payload
 
 
 # Schemas (request/response)
 class SignupRequest(BaseModel):
     name: str
-    email: EmailStr
+    email: Email
     password: str
     role: str  # vendor | buyer | investor | employee | admin
 
 
 class LoginRequest(BaseModel):
-    email: EmailStr
+    email: Email
     password: str
 
 
-class AuthResponse(BaseModel):
+# Response shape only, never validated; encoded with msgspec
+class AuthResponse(msgspec.Struct, kw_only=True):
     access_token: str
     token_type: str = "bearer"
     user: Dict[str, Any]
 
 
+_auth_encoder = msgspec.json.Encoder()
+
+# Documents the auth response in OpenAPI without FastAPI validating it at runtime
+_, _auth_components = msgspec.json.schema_components([AuthResponse])
+AUTH_RESPONSES = {
+    200: {
+        "description": "Successful Response",
+        "content": {"application/json": {"schema": _auth_components["AuthResponse"]}},
+    }
+}
+
+
+def auth_response(token: str, user: dict) -> Response:
+    body = _auth_encoder.encode(AuthResponse(access_token=token, user=user))
+    return Response(content=body, media_type="application/json")
+
+
 class ProductPayload(BaseModel):
     title: str
     specs: Optional[str] = None
@@ -113,32 +260,85 @@ class ApplyPayload(BaseModel):
     resume_url: Optional[str] = None
 
 
+# Request body validators, compiled once at import
+SIGNUP_ADAPTER = TypeAdapter(SignupRequest)
+LOGIN_ADAPTER = TypeAdapter(LoginRequest)
+PRODUCT_ADAPTER = TypeAdapter(ProductPayload)
+REQUIREMENT_ADAPTER = TypeAdapter(RequirementPayload)
+PROJECT_ADAPTER = TypeAdapter(ProjectPayload)
+INVEST_ADAPTER = TypeAdapter(InvestPayload)
+JOB_ADAPTER = TypeAdapter(JobPayload)
+APPLY_ADAPTER = TypeAdapter(ApplyPayload)
+
+
+def json_body(adapter: TypeAdapter):
+    """Dependency validating the raw request body with a prebuilt adapter"""
+    async def dependency(request: Request):
+        try:
+            return adapter.validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError(
+                [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+            )
+    return dependency
+
+
+def body_doc(model: type) -> dict:
+    """OpenAPI requestBody for routes that parse the body via json_body"""
+    return {"requestBody": {"required": True, "content": {"application/json": {"schema": model.model_json_schema()}}}}
+
+
+async def stream_json_array(first: dict, rest: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """Encode documents one at a time as a JSON array, stringifying _id"""
+    first["_id"] = str(first["_id"]) if "_id" in first else None
+    yield b"[" + orjson.dumps(first)
+    async for d in rest:
+        d["_id"] = str(d["_id"]) if "_id" in d else None
+        yield b"," + orjson.dumps(d)
+    yield b"]"
+
+
+async def json_array_response(docs: AsyncIterable[dict]) -> Response:
+    # fetch the first document before any bytes go out, so query and
+    # connection errors still surface as a 500 instead of a truncated 200
+    it = docs.__aiter__()
+    try:
+        first = await it.__anext__()
+    except StopAsyncIteration:
+        return Response(content=b"[]", media_type="application/json")
+    return StreamingResponse(stream_json_array(first, it), media_type="application/json")
+
+
 # Auth dependency
 
-def get_current_user(authorization: Optional[str] = Header(None)) -> dict:
+async def get_current_user(authorization: Optional[str] = Header(None)) -> dict:
     if not authorization:
         raise HTTPException(status_code=401, detail="Missing Authorization header")
-    scheme, _, token = authorization.partition(" ")
-    if scheme.lower() != "bearer" or not token:
+    if not authorization.startswith(("Bearer ", "bearer ")) or len(authorization) == 7:
         raise HTTPException(status_code=401, detail="Invalid auth header")
+    token = authorization[7:]
     payload = decode_token(token)
-    user = db["user"].find_one({"email": payload.get("sub")})
+    email = payload.get("sub")
+    cached = _USER_CACHE.get(email)
+    if cached is not None and cached[0] > time.time():
+        return cached[1]
+    user = await db["user"].find_one({"email": email}, {"password_hash": 0})
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     # sanitize
     user["_id"] = str(user["_id"]) if "_id" in user else None
-    user.pop("password_hash", None)
+    cache_user(user)
     return user
 
 
 # Health and info
 @app.get("/")
-def root():
+async def root():
     return {"message": "Proton API running"}
 
 
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -152,7 +352,7 @@ def test_database():
             response["database"] = "✅ Available"
             response["database_url"] = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
             response["database_name"] = os.getenv("DATABASE_NAME") or "❌ Not Set"
-            collections = db.list_collection_names()
+            collections = await db.list_collection_names()
             response["collections"] = collections[:10]
             response["connection_status"] = "Connected"
             response["database"] = "✅ Connected & Working"
@@ -163,7 +363,7 @@ def test_database():
 
 # Schemas endpoint to support viewers
 @app.get("/schema")
-def get_schema():
+async def get_schema():
     # Minimal schema description for key collections
     return {
         "collections": [
@@ -182,114 +382,112 @@ def get_schema():
 
 
 # Authentication
-@app.post("/auth/signup", response_model=AuthResponse)
-def signup(payload: SignupRequest):
-    email = payload.email.lower()
-    existing = db["user"].find_one({"email": email})
+@app.post("/auth/signup", responses=AUTH_RESPONSES, openapi_extra=body_doc(SignupRequest))
+async def signup(payload: SignupRequest = Depends(json_body(SIGNUP_ADAPTER))):
+    email = payload.email
+    existing = await db["user"].find_one({"email": email})
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
+    now = datetime.now(timezone.utc)
     user_doc = {
         "name": payload.name,
         "email": email,
         "phone": None,
         "role": payload.role,
-        "password_hash": hash_password(payload.password),
+        "password_hash": await run_in_threadpool(hash_password, payload.password),
         "kyc_status": "pending",
         "company_id": None,
         "is_active": True,
-        "created_at": datetime.now(timezone.utc),
-        "updated_at": datetime.now(timezone.utc),
+        "created_at": now,
+        "updated_at": now,
     }
-    result = db["user"].insert_one(user_doc)
+    result = await db["user"].insert_one(user_doc)
     sub = email
-    token = create_token({"sub": sub, "role": payload.role})
+    token = create_token({"sub": sub, "role": payload.role}, now=now)
     user_doc["_id"] = str(result.inserted_id)
     user_doc.pop("password_hash", None)
-    return {"access_token": token, "user": user_doc}
+    # cache the user as motor will read it back: naive UTC, millisecond precision
+    stored_now = now.replace(microsecond=now.microsecond // 1000 * 1000, tzinfo=None)
+    cache_user({**user_doc, "created_at": stored_now, "updated_at": stored_now})
+    return auth_response(token, user_doc)
 
 
-@app.post("/auth/login", response_model=AuthResponse)
-def login(payload: LoginRequest):
-    email = payload.email.lower()
-    user = db["user"].find_one({"email": email})
-    if not user or not verify_password(payload.password, user.get("password_hash", "")):
+@app.post("/auth/login", responses=AUTH_RESPONSES, openapi_extra=body_doc(LoginRequest))
+async def login(payload: LoginRequest = Depends(json_body(LOGIN_ADAPTER))):
+    email = payload.email
+    user = await db["user"].find_one({"email": email})
+    if not user or not await run_in_threadpool(verify_password, payload.password, user.get("password_hash", "")):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     if not user.get("is_active", True):
         raise HTTPException(status_code=403, detail="User deactivated")
+    if pwd_context.needs_update(user["password_hash"]):
+        new_hash = await run_in_threadpool(hash_password, payload.password)
+        await db["user"].update_one({"_id": user["_id"]}, {"$set": {"password_hash": new_hash}})
     token = create_token({"sub": email, "role": user.get("role")})
     user["_id"] = str(user["_id"]) if "_id" in user else None
     user.pop("password_hash", None)
-    return {"access_token": token, "user": user}
+    return auth_response(token, user)
 
 
 @app.get("/auth/me")
-def me(user: dict = Depends(get_current_user)):
-    return user
+async def me(user: dict = Depends(get_current_user)):
+    return ORJSONResponse(user)
 
 
 # Vendor endpoints
-@app.post("/vendor/products")
-def create_product(payload: ProductPayload, user: dict = Depends(get_current_user)):
+@app.post("/vendor/products", openapi_extra=body_doc(ProductPayload))
+async def create_product(payload: ProductPayload = Depends(json_body(PRODUCT_ADAPTER)), user: dict = Depends(get_current_user)):
     if user.get("role") != "vendor":
         raise HTTPException(status_code=403, detail="Only vendors can create products")
-    doc = payload.dict()
+    doc = payload.model_dump()
     doc.update({"vendor_id": user.get("_id")})
-    inserted_id = create_document("productlisting", doc)
+    inserted_id = await create_document("productlisting", doc)
     return {"id": inserted_id, "message": "Product listed"}
 
 
 @app.get("/vendor/products")
-def my_products(user: dict = Depends(get_current_user)):
+async def my_products(user: dict = Depends(get_current_user)):
     if user.get("role") != "vendor":
         raise HTTPException(status_code=403, detail="Only vendors can view this")
-    docs = get_documents("productlisting", {"vendor_id": user.get("_id")})
-    for d in docs:
-        d["_id"] = str(d["_id"]) if "_id" in d else None
-    return docs
+    return await json_array_response(iter_documents("productlisting", {"vendor_id": user.get("_id")}))
 
 
 # Buyer endpoints
-@app.post("/buyer/requirements")
-def create_requirement(payload: RequirementPayload, user: dict = Depends(get_current_user)):
+@app.post("/buyer/requirements", openapi_extra=body_doc(RequirementPayload))
+async def create_requirement(payload: RequirementPayload = Depends(json_body(REQUIREMENT_ADAPTER)), user: dict = Depends(get_current_user)):
     if user.get("role") != "buyer":
         raise HTTPException(status_code=403, detail="Only buyers can post requirements")
-    doc = payload.dict()
+    doc = payload.model_dump()
     doc.update({"buyer_id": user.get("_id"), "status": "submitted"})
-    inserted_id = create_document("buyerrequirement", doc)
+    inserted_id = await create_document("buyerrequirement", doc)
     return {"id": inserted_id, "message": "Requirement posted"}
 
 
 @app.get("/buyer/requirements")
-def my_requirements(user: dict = Depends(get_current_user)):
+async def my_requirements(user: dict = Depends(get_current_user)):
     if user.get("role") != "buyer":
         raise HTTPException(status_code=403, detail="Only buyers can view this")
-    docs = get_documents("buyerrequirement", {"buyer_id": user.get("_id")})
-    for d in docs:
-        d["_id"] = str(d["_id"]) if "_id" in d else None
-    return docs
+    return await json_array_response(iter_documents("buyerrequirement", {"buyer_id": user.get("_id")}))
 
 
 # Investor endpoints
-@app.post("/investor/projects")
-def create_project(payload: ProjectPayload, user: dict = Depends(get_current_user)):
+@app.post("/investor/projects", openapi_extra=body_doc(ProjectPayload))
+async def create_project(payload: ProjectPayload = Depends(json_body(PROJECT_ADAPTER)), user: dict = Depends(get_current_user)):
     if user.get("role") not in ("vendor", "admin"):
         raise HTTPException(status_code=403, detail="Only vendors or admins can create projects")
-    doc = payload.dict()
+    doc = payload.model_dump()
     doc.update({"owner_vendor_id": user.get("_id")})
-    inserted_id = create_document("investmentproject", doc)
+    inserted_id = await create_document("investmentproject", doc)
     return {"id": inserted_id, "message": "Project created"}
 
 
 @app.get("/investor/projects")
-def list_projects():
-    docs = get_documents("investmentproject")
-    for d in docs:
-        d["_id"] = str(d["_id"]) if "_id" in d else None
-    return docs
+async def list_projects():
+    return await json_array_response(iter_documents("investmentproject"))
 
 
-@app.post("/investor/invest")
-def invest(payload: InvestPayload, user: dict = Depends(get_current_user)):
+@app.post("/investor/invest", openapi_extra=body_doc(InvestPayload))
+async def invest(payload: InvestPayload = Depends(json_body(INVEST_ADAPTER)), user: dict = Depends(get_current_user)):
     if user.get("role") != "investor":
         raise HTTPException(status_code=403, detail="Only investors can invest")
     doc = {
@@ -298,59 +496,69 @@ def invest(payload: InvestPayload, user: dict = Depends(get_current_user)):
         "amount": payload.amount,
         "status": "initiated",
     }
-    inserted_id = create_document("transaction", doc)
+    inserted_id = await create_document("transaction", doc)
     return {"id": inserted_id, "message": "Investment initiated"}
 
 
 # Jobs endpoints
-@app.post("/job/listings")
-def create_job(payload: JobPayload, user: dict = Depends(get_current_user)):
+@app.post("/job/listings", openapi_extra=body_doc(JobPayload))
+async def create_job(payload: JobPayload = Depends(json_body(JOB_ADAPTER)), user: dict = Depends(get_current_user)):
     if user.get("role") not in ("vendor", "admin"):
         raise HTTPException(status_code=403, detail="Only vendors/admins can post jobs")
-    doc = payload.dict()
-    inserted_id = create_document("joblisting", doc)
+    doc = payload.model_dump()
+    inserted_id = await create_document("joblisting", doc)
     return {"id": inserted_id, "message": "Job posted"}
 
 
 @app.get("/job/listings")
-def list_jobs():
-    docs = get_documents("joblisting")
-    for d in docs:
-        d["_id"] = str(d["_id"]) if "_id" in d else None
-    return docs
+async def list_jobs():
+    return await json_array_response(iter_documents("joblisting"))
 
 
-@app.post("/job/apply")
-def apply_job(payload: ApplyPayload, user: dict = Depends(get_current_user)):
+@app.post("/job/apply", openapi_extra=body_doc(ApplyPayload))
+async def apply_job(payload: ApplyPayload = Depends(json_body(APPLY_ADAPTER)), user: dict = Depends(get_current_user)):
     if user.get("role") not in ("employee", "admin"):
         raise HTTPException(status_code=403, detail="Only employees/admins can apply")
     doc = {"job_id": payload.job_id, "user_id": user.get("_id"), "status": "applied", "resume_url": payload.resume_url}
-    inserted_id = create_document("jobapplication", doc)
+    inserted_id = await create_document("jobapplication", doc)
     return {"id": inserted_id, "message": "Application submitted"}
 
 
 # Admin
+ADMIN_COUNTS = {
+    "users": "user",
+    "products": "productlisting",
+    "requirements": "buyerrequirement",
+    "projects": "investmentproject",
+    "transactions": "transaction",
+    "jobs": "joblisting",
+    "applications": "jobapplication",
+}
+
+
 @app.get("/admin/overview")
-def admin_overview(user: dict = Depends(get_current_user)):
+async def admin_overview(user: dict = Depends(get_current_user)):
     if user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Admin only")
-    def count(col):
+    async def count(col):
         try:
-            return db[col].count_documents({})
+            return await db[col].estimated_document_count()
         except Exception:
             return 0
-    return {
-        "users": count("user"),
-        "products": count("productlisting"),
-        "requirements": count("buyerrequirement"),
-        "projects": count("investmentproject"),
-        "transactions": count("transaction"),
-        "jobs": count("joblisting"),
-        "applications": count("jobapplication"),
-    }
+    counts = await asyncio.gather(*(count(col) for col in ADMIN_COUNTS.values()))
+    return dict(zip(ADMIN_COUNTS, counts))
 
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    # an import string is required for uvicorn to spawn multiple workers
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        loop="uvloop",
+        http="httptools",
+        workers=workers,
+    )
@@ -3,10 +3,29 @@ Database Schemas for Proton
 
 Each Pydantic model represents a MongoDB collection with the collection name as the lowercase of the class name.
 """
-from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List, Literal
+import re
+from pydantic import BaseModel, Field, AfterValidator, BeforeValidator
+from typing import Optional, List, Literal, Annotated
 from datetime import datetime
 
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+def _lower(v):
+    return v.lower() if isinstance(v, str) else v
+
+def _check_email(v: str) -> str:
+    if not EMAIL_RE.fullmatch(v):
+        raise ValueError("value is not a valid email address")
+    return v
+
+# Lowercased, syntactic email check; cheaper than EmailStr (no email-validator/idna)
+Email = Annotated[
+    str,
+    BeforeValidator(_lower),
+    AfterValidator(_check_email),
+    Field(json_schema_extra={"format": "email"}),
+]
+
 Role = Literal["vendor", "buyer", "investor", "employee", "admin"]
 KYCStatus = Literal["pending", "approved", "rejected"]
 OrderStatus = Literal["draft", "submitted", "in_progress", "completed", "cancelled"]
@@ -15,7 +34,7 @@ ApplicationStatus = Literal["applied", "review", "interview", "offer", "rejected
 
 class User(BaseModel):
     name: str
-    email: EmailStr
+    email: Email
     phone: Optional[str] = None
     role: Role
     password_hash: str
@@ -30,7 +49,7 @@ class Company(BaseModel):
     certifications: List[str] = []
     categories: List[str] = []
     capacity_per_month: Optional[int] = None
-    contact_email: Optional[EmailStr] = None
+    contact_email: Optional[Email] = None
     contact_phone: Optional[str] = None
 
 class Vendorprofile(BaseModel):
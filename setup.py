@@ -0,0 +1,26 @@
+"""
+Optional Cython build of the API module
+
+    pip install "Cython>=3.0"
+    python setup.py build_ext --inplace
+
+The extension is built as ``main_compiled`` so it never shadows main.py;
+``uvicorn asgi:app`` serves it when it is newer than main.py and falls back to
+main.py otherwise.
+"""
+from setuptools import setup, Extension
+from Cython.Build import cythonize
+
+setup(
+    name="proton-api",
+    ext_modules=cythonize(
+        [Extension("main_compiled", ["main.py"])],
+        build_dir="build",
+        compiler_directives={
+            "language_level": 3,
+            # FastAPI and pydantic introspect signatures and annotations at import
+            "binding": True,
+            "annotation_typing": False,
+        },
+    ),
+)
@@ -0,0 +1,136 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import main
+
+
+class FakeUsers:
+    def __init__(self, docs):
+        self.docs = docs
+        self.reads = 0
+
+    async def find_one(self, filter_dict, projection=None):
+        self.reads += 1
+        doc = self.docs.get(filter_dict["email"])
+        if doc is None:
+            return None
+        doc = dict(doc)
+        for field in projection or {}:
+            doc.pop(field, None)
+        return doc
+
+
+class FakeDB:
+    def __init__(self, users):
+        self.users = users
+
+    def __getitem__(self, name):
+        assert name == "user"
+        return self.users
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    main._TOKEN_CACHE.clear()
+    main._USER_CACHE.clear()
+    yield
+    main._TOKEN_CACHE.clear()
+    main._USER_CACHE.clear()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr(main.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def users(monkeypatch):
+    users = FakeUsers({
+        "a@b.co": {"_id": "u1", "email": "a@b.co", "role": "buyer", "password_hash": "x"},
+    })
+    monkeypatch.setattr(main, "db", FakeDB(users))
+    return users
+
+
+def auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+# JWT cache
+
+def test_decode_token_caches_by_raw_token(monkeypatch):
+    token = main.create_token({"sub": "a@b.co"})
+    calls = []
+    real_decode = main.jwt.decode
+    monkeypatch.setattr(main.jwt, "decode", lambda *a, **kw: calls.append(1) or real_decode(*a, **kw))
+    first = main.decode_token(token)
+    assert main.decode_token(token) is first
+    assert len(calls) == 1
+
+
+def test_decode_token_expires_cached_entry_at_exp(clock):
+    token = main.create_token({"sub": "a@b.co"})
+    exp = main.decode_token(token)["exp"]
+    clock[0] = exp - 1
+    assert main.decode_token(token)["sub"] == "a@b.co"
+    clock[0] = exp
+    with pytest.raises(HTTPException) as e:
+        main.decode_token(token)
+    assert e.value.status_code == 401
+    assert e.value.detail == "Token expired"
+    assert token not in main._TOKEN_CACHE
+
+
+def test_decode_token_does_not_cache_invalid_tokens():
+    with pytest.raises(HTTPException) as e:
+        main.decode_token("not-a-jwt")
+    assert e.value.detail == "Invalid token"
+    assert not main._TOKEN_CACHE
+
+
+# Bounded insert
+
+def test_cache_put_evicts_expired_entries_first(clock):
+    cache = {}
+    main._cache_put(cache, "old", clock[0] + 100, {}, 3)
+    main._cache_put(cache, "stale", clock[0] - 1, {}, 3)
+    main._cache_put(cache, "mid", clock[0] + 100, {}, 3)
+    main._cache_put(cache, "new", clock[0] + 100, {}, 3)
+    assert list(cache) == ["old", "mid", "new"]
+
+
+def test_cache_put_evicts_oldest_when_nothing_expired(clock):
+    cache = {}
+    for key in ("a", "b", "c"):
+        main._cache_put(cache, key, clock[0] + 100, {}, 3)
+    main._cache_put(cache, "d", clock[0] + 100, {}, 3)
+    assert list(cache) == ["b", "c", "d"]
+
+
+# User cache
+
+def test_me_is_served_from_user_cache(users):
+    client = TestClient(main.app)
+    token = main.create_token({"sub": "a@b.co"})
+    first = client.get("/auth/me", headers=auth(token))
+    second = client.get("/auth/me", headers=auth(token))
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json() == {"_id": "u1", "email": "a@b.co", "role": "buyer"}
+    assert users.reads == 1
+
+
+def test_user_cache_expires_after_ttl(users, clock):
+    client = TestClient(main.app)
+    token = main.create_token({"sub": "a@b.co"})
+    client.get("/auth/me", headers=auth(token))
+    clock[0] += main._USER_CACHE_TTL - 1
+    client.get("/auth/me", headers=auth(token))
+    assert users.reads == 1
+    clock[0] += 1
+    client.get("/auth/me", headers=auth(token))
+    assert users.reads == 2
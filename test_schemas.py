@@ -0,0 +1,26 @@
+import pytest
+from pydantic import ValidationError
+
+from schemas import User
+
+
+def make_user(email):
+    return User(name="A", email=email, role="buyer", password_hash="x")
+
+
+def test_email_accepts_plain_address():
+    assert make_user("a@b.co").email == "a@b.co"
+
+
+def test_email_is_lowercased():
+    assert make_user("A@B.Co").email == "a@b.co"
+
+
+@pytest.mark.parametrize("email", ["a@b.co\n", "a b@c.co", "a@b", "@b.co"])
+def test_email_rejects_invalid(email):
+    with pytest.raises(ValidationError):
+        make_user(email)
+
+
+def test_email_schema_keeps_format():
+    assert User.model_json_schema()["properties"]["email"]["format"] == "email"